@@ -1,6 +1,8 @@
 from contextlib import contextmanager
 from pathlib import Path
 
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
 from sqlmodel import Session, SQLModel, create_engine
 
 # Ensure models are imported so SQLModel metadata is fully populated
@@ -11,12 +13,53 @@ DB_PATH = Path("data")
 DB_PATH.mkdir(exist_ok=True)
 DATABASE_URL = f"sqlite:///{DB_PATH / 'queue.db'}"
 
+# SQLite allows a single writer, so writes go through a one-connection pool while
+# reads share a larger pool of warm connections (each keeps its own page cache)
 engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_recycle=3600,
 )
+read_engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=5,
+    max_overflow=10,
+    pool_recycle=3600,
+)
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA busy_timeout=10000",
+)
+
+
+@event.listens_for(engine, "connect")
+@event.listens_for(read_engine, "connect")
+def apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # Pragmas other than journal_mode are per-connection, so run them on every new one
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+# Stored in PRAGMA user_version once the tables, added columns and indexes are in place
+SCHEMA_VERSION = 2
 
 
 def init_db() -> None:
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA user_version").scalar() >= SCHEMA_VERSION:
+            return
+
     SQLModel.metadata.create_all(engine)
     with engine.begin() as conn:
         columns = {
@@ -31,9 +74,22 @@ def init_db() -> None:
             conn.exec_driver_sql(
                 "ALTER TABLE queueentry ADD COLUMN birthday DATE"
             )
+        # Declared on QueueEntry too; create_all only adds it with a new table, so
+        # databases created before the index existed get it here
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_qe_date_status_idx "
+            "ON queueentry (service_date, status, ticket_index)"
+        )
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
 
 @contextmanager
 def get_session() -> Session:
     with Session(engine) as session:
         yield session
+
+
+@contextmanager
+def get_read_session() -> Session:
+    with Session(read_engine) as session:
+        yield session
@@ -1,25 +1,62 @@
+from collections import Counter, defaultdict
 from datetime import date, datetime
+import functools
+import hashlib
+import operator
+import os
 import re
-from typing import Optional
+import threading
+import time
+from typing import Callable, Iterator, Optional, TypeVar, Union
+from xml.sax.saxutils import escape
 
 from fastapi import Body, Depends, FastAPI, Form, HTTPException, Query, Request, status
-from fastapi.responses import HTMLResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+import orjson
 from pydantic import BaseModel, ConfigDict, field_validator
-from sqlalchemy import delete, func
+from sqlalchemy import ColumnElement, Row, Select, case, func, insert, literal, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Session, select
 
-from .database import get_session, init_db
+from .database import DB_PATH, get_read_session, get_session, init_db
 from .models import QueueDay, QueueEntry, QueueLoadSnapshot
 
 
 app = FastAPI(
     title="Queue Service",
+    default_response_class=ORJSONResponse,
     openapi_url="/queue/openapi.json",
     docs_url="/queue/docs",
     redoc_url="/queue/redoc",
 )
+# Set QUEUE_TEMPLATE_AUTO_RELOAD=1 while editing templates; otherwise they are compiled
+# once and the bytecode is reused across restarts
+TEMPLATE_AUTO_RELOAD = os.getenv("QUEUE_TEMPLATE_AUTO_RELOAD", "").lower() in {"1", "true", "yes"}
+TEMPLATE_CACHE_PATH = DB_PATH / "jinja_cache"
+TEMPLATE_CACHE_PATH.mkdir(exist_ok=True)
+
 templates = Jinja2Templates(directory="app/templates")
+templates.env.bytecode_cache = FileSystemBytecodeCache(directory=str(TEMPLATE_CACHE_PATH))
+templates.env.auto_reload = TEMPLATE_AUTO_RELOAD
+
+
+T = TypeVar("T")
+
+# SQLite admits one writer at a time; queueing writers on an in-process lock avoids
+# spinning in SQLite's busy handler when several mutations arrive together
+_write_lock = threading.Lock()
+
+
+def serialize_writes(endpoint: Callable[..., T]) -> Callable[..., T]:
+    @functools.wraps(endpoint)
+    def wrapper(*args: object, **kwargs: object) -> T:
+        with _write_lock:
+            return endpoint(*args, **kwargs)
+
+    return wrapper
 
 
 def get_db_session() -> Session:
@@ -27,6 +64,26 @@ def get_db_session() -> Session:
         yield session
 
 
+def get_read_db_session() -> Session:
+    with get_read_session() as session:
+        yield session
+
+
+# Pollers send the same service_date on every request. Failed parses raise and are
+# never cached, and resolve_service_day keeps the uncached date.today() fallback
+@functools.lru_cache(maxsize=64)
+def parse_ymd(value: str) -> date:
+    # fromisoformat also accepts YYYYMMDD and week dates, so only hand it the strict
+    # YYYY-MM-DD shape; anything else goes through strptime so the accepted formats
+    # and the raised ValueError stay the same
+    if len(value) == 10 and value[4] == "-" and value[7] == "-":
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
 def parse_service_date_value(value: object) -> Optional[date]:
     if value in (None, "", "null"):
         return None
@@ -34,12 +91,25 @@ def parse_service_date_value(value: object) -> Optional[date]:
         return value
     if isinstance(value, str):
         try:
-            return datetime.strptime(value, "%Y-%m-%d").date()
+            return parse_ymd(value)
         except ValueError as exc:
             raise ValueError("service_date must use YYYY-MM-DD format") from exc
     raise ValueError("Unsupported service_date value")
 
 
+def parse_birthday_value(value: object) -> Optional[date]:
+    if value in (None, "", "null"):
+        return None
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return parse_ymd(value)
+        except ValueError as exc:
+            raise ValueError("birthday must use YYYY-MM-DD format") from exc
+    raise ValueError("Unsupported birthday value")
+
+
 class StartDayRequest(BaseModel):
     service_date: Optional[date] = None
     overwrite: bool = False
@@ -64,16 +134,7 @@ class QueueEntryCreate(BaseModel):
     @field_validator("birthday", mode="before")
     @classmethod
     def parse_birthday(cls, value: object) -> Optional[date]:
-        if value in (None, "", "null"):
-            return None
-        if isinstance(value, date):
-            return value
-        if isinstance(value, str):
-            try:
-                return datetime.strptime(value, "%Y-%m-%d").date()
-            except ValueError as exc:
-                raise ValueError("birthday must use YYYY-MM-DD format") from exc
-        raise ValueError("Unsupported birthday value")
+        return parse_birthday_value(value)
 
 
 class QueueEntryUpdate(BaseModel):
@@ -84,16 +145,7 @@ class QueueEntryUpdate(BaseModel):
     @field_validator("birthday", mode="before")
     @classmethod
     def parse_birthday(cls, value: object) -> Optional[date]:
-        if value in (None, "", "null"):
-            return None
-        if isinstance(value, date):
-            return value
-        if isinstance(value, str):
-            try:
-                return datetime.strptime(value, "%Y-%m-%d").date()
-            except ValueError as exc:
-                raise ValueError("birthday must use YYYY-MM-DD format") from exc
-        raise ValueError("Unsupported birthday value")
+        return parse_birthday_value(value)
 
 
 class QueueEntryRead(BaseModel):
@@ -110,6 +162,14 @@ class QueueEntryRead(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+_ENTRY_FIELDS = tuple(QueueEntryRead.model_fields)
+
+
+def build_entry_read(entry: QueueEntry) -> QueueEntryRead:
+    # Rows come from typed columns, so skip validation and just copy the fields
+    return QueueEntryRead.model_construct(**{field: getattr(entry, field) for field in _ENTRY_FIELDS})
+
+
 class QueueDayRead(BaseModel):
     service_date: date
     started_at: datetime
@@ -129,7 +189,7 @@ def on_startup() -> None:
 
 
 @app.get("/queue/health")
-def healthcheck() -> dict[str, str]:
+async def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
 
 
@@ -137,125 +197,131 @@ def resolve_service_day(value: Optional[str]) -> date:
     if value is None or value == "":
         return date.today()
     try:
-        return datetime.strptime(value, "%Y-%m-%d").date()
+        return parse_ymd(value)
     except ValueError as exc:
         raise HTTPException(
             status_code=400, detail="Invalid service_date format. Use YYYY-MM-DD."
         ) from exc
 
 
-PERSIAN_DIGIT_TRANSLATION = {
-    ord("۰"): "0",
-    ord("۱"): "1",
-    ord("۲"): "2",
-    ord("۳"): "3",
-    ord("۴"): "4",
-    ord("۵"): "5",
-    ord("۶"): "6",
-    ord("۷"): "7",
-    ord("۸"): "8",
-    ord("۹"): "9",
-    ord("٠"): "0",
-    ord("١"): "1",
-    ord("٢"): "2",
-    ord("٣"): "3",
-    ord("٤"): "4",
-    ord("٥"): "5",
-    ord("٦"): "6",
-    ord("٧"): "7",
-    ord("٨"): "8",
-    ord("٩"): "9",
-}
+PERSIAN_DIGIT_TRANSLATION = str.maketrans(
+    "۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩",
+    "01234567890123456789",
+)
 
 
 def normalize_digits(value: str) -> str:
-    return (value or "").translate(PERSIAN_DIGIT_TRANSLATION)
+    value = value or ""
+    # Most input is typed with ASCII digits already
+    if value.isascii():
+        return value
+    return value.translate(PERSIAN_DIGIT_TRANSLATION)
+
+
+# Separators dropped from phone input: dashes, parentheses and any Unicode whitespace
+_PHONE_STRIP = str.maketrans(
+    "", "", "-()" + "".join(char for char in map(chr, range(0x3001)) if char.isspace())
+)
+# Optional "+" or "00", then the "98" country code, a trunk "0" or nothing (unless the
+# number itself starts with 98), then the 10-digit local number starting with 9
+_IRAN_MOBILE_PATTERN = re.compile(r"(?:\+|00)?(?:98|0|(?!98))(9[0-9]{9})")
 
 
+@functools.lru_cache(maxsize=1024)
 def normalize_phone(phone: str) -> str:
-    normalized = normalize_digits(phone or "")
-    cleaned = re.sub(r"[\s\-()]+", "", normalized)
+    cleaned = normalize_digits(phone or "").translate(_PHONE_STRIP)
     if not cleaned:
         raise HTTPException(status_code=400, detail="Phone number is required")
 
-    if cleaned.startswith("00"):
-        cleaned = "+" + cleaned[2:]
-
-    if cleaned.startswith("+"):
-        digits = cleaned[1:]
-    else:
-        digits = cleaned
-
-    if digits.startswith("98"):
-        local = digits[2:]
-    elif digits.startswith("0") and len(digits) == 11 and digits[1] == "9":
-        local = digits[1:]
-    elif digits.startswith("9") and len(digits) == 10:
-        local = digits
-    else:
-        raise HTTPException(status_code=400, detail="Invalid Iranian mobile number format")
-
-    if len(local) != 10 or not local.isdigit() or not local.startswith("9"):
+    match = _IRAN_MOBILE_PATTERN.fullmatch(cleaned)
+    if match is None:
         raise HTTPException(status_code=400, detail="Invalid Iranian mobile number format")
 
-    return f"+98{local}"
+    return f"+98{match.group(1)}"
 
 
 SNAPSHOT_INTERVAL_MINUTES = 30
 
 
-def truncate_to_window(dt: datetime, minutes: int = SNAPSHOT_INTERVAL_MINUTES) -> datetime:
-    minute = (dt.minute // minutes) * minutes
-    return dt.replace(minute=minute, second=0, microsecond=0)
+def window_key(ts: Optional[float] = None, minutes: int = SNAPSHOT_INTERVAL_MINUTES) -> int:
+    # Start of the window as epoch seconds; matches the wall-clock truncation since
+    # the interval divides an hour
+    seconds = int(time.time() if ts is None else ts)
+    return seconds - seconds % (minutes * 60)
+
+
+def truncate_to_window(ts: Optional[float] = None, minutes: int = SNAPSHOT_INTERVAL_MINUTES) -> datetime:
+    return datetime.utcfromtimestamp(window_key(ts, minutes))
 
 
-def fetch_queue_entries(session: Session, service_day: date) -> list[QueueEntry]:
+_QUEUE_ROW_KEYS = ("ticket", "name", "phone", "status", "birthday")
+
+
+def fetch_queue_rows(session: Session, service_day: date) -> list[Row]:
+    # Only the columns the display needs, as plain rows instead of ORM instances
     return session.exec(
-        select(QueueEntry)
+        select(
+            QueueEntry.ticket_number,
+            QueueEntry.name,
+            QueueEntry.phone,
+            QueueEntry.status,
+            QueueEntry.birthday,
+        )
         .where(QueueEntry.service_date == service_day)
         .order_by(QueueEntry.ticket_index.asc())
     ).all()
 
 
-def summarize_queue(entries: list[QueueEntry]) -> dict[str, object]:
-    active_entry: Optional[QueueEntry] = None
-    next_entry: Optional[QueueEntry] = None
-    waiting_count = 0
-    served_count = 0
-
-    for entry in entries:
-        if entry.status == "served":
-            served_count += 1
-            continue
-        if entry.status == "active" and active_entry is None:
-            active_entry = entry
-        if entry.status == "waiting":
-            waiting_count += 1
-            if next_entry is None:
-                next_entry = entry
-
-    pending_count = len(entries) - served_count
+def summarize_queue(entries: list[Row]) -> dict[str, object]:
+    status_counts = Counter(entry.status for entry in entries)
+    served_count = status_counts["served"]
+    return {
+        "active": next((entry for entry in entries if entry.status == "active"), None),
+        "next": next((entry for entry in entries if entry.status == "waiting"), None),
+        "count": len(entries),
+        "waiting_count": status_counts["waiting"],
+        "served_count": served_count,
+        "pending_count": len(entries) - served_count,
+    }
+
+
+def count_queue_entries(session: Session, service_day: date) -> dict[str, int]:
+    status_counts = dict(
+        session.exec(
+            select(QueueEntry.status, func.count())
+            .where(QueueEntry.service_date == service_day)
+            .group_by(QueueEntry.status)
+        ).all()
+    )
+    count = sum(status_counts.values())
+    served_count = status_counts.get("served", 0)
     return {
-        "active": active_entry,
-        "next": next_entry,
-        "waiting_count": waiting_count,
+        "count": count,
+        "waiting_count": status_counts.get("waiting", 0),
         "served_count": served_count,
-        "pending_count": pending_count,
+        "pending_count": count - served_count,
     }
 
 
+# Last (window_key, counts) written per service date, so mutations that leave the
+# counters unchanged within a window (edits, re-calls) skip the snapshot write
+_snapshot_cache: dict[date, tuple[int, tuple[int, int, int]]] = {}
+
+
 def record_queue_snapshot(
     session: Session,
     service_day: date,
-    entries: Optional[list[QueueEntry]] = None,
     summary: Optional[dict[str, object]] = None,
 ) -> None:
-    if entries is None:
-        entries = fetch_queue_entries(session, service_day)
     if summary is None:
-        summary = summarize_queue(entries)
+        summary = count_queue_entries(session, service_day)
 
-    window_start = truncate_to_window(datetime.utcnow())
+    window = window_key()
+    counts = (summary["pending_count"], summary["waiting_count"], summary["served_count"])
+    if _snapshot_cache.get(service_day) == (window, counts):
+        return
+
+    window_start = truncate_to_window(window)
     snapshot = session.get(QueueLoadSnapshot, (service_day, window_start))
     if snapshot is None:
         snapshot = QueueLoadSnapshot(
@@ -272,6 +338,33 @@ def record_queue_snapshot(
         snapshot.served_count = summary["served_count"]
         snapshot.captured_at = datetime.utcnow()
     session.commit()
+    _snapshot_cache[service_day] = (window, counts)
+
+
+# /queue/display bodies are cached per (service_date, full) as (version, expires_at,
+# body, etag). Mutations in this process bump the day's version; the short TTL bounds
+# staleness from writes made by other worker processes.
+DISPLAY_CACHE_TTL_SECONDS = 1.0
+
+_display_version: dict[date, int] = defaultdict(int)
+_display_cache: dict[tuple[date, bool], tuple[int, float, bytes, str]] = {}
+
+
+def prune_expired(cache: dict, now: float) -> None:
+    # Response caches are keyed on client-supplied service dates, so drop lapsed
+    # entries whenever a new one is stored to keep them bounded
+    for key in [key for key, cached in cache.items() if cached[1] <= now]:
+        del cache[key]
+
+
+# Service dates known to have a QueueDay row, so create_entry can skip registering them
+_known_days: set[date] = set()
+
+
+def bump_display_version(service_day: date) -> None:
+    _display_version[service_day] += 1
+    _display_cache.pop((service_day, False), None)
+    _display_cache.pop((service_day, True), None)
 
 
 def get_active_entry(session: Session, service_day: date) -> Optional[QueueEntry]:
@@ -282,112 +375,195 @@ def get_active_entry(session: Session, service_day: date) -> Optional[QueueEntry
             QueueEntry.status == "active",
         )
         .order_by(QueueEntry.ticket_index.asc())
+        .limit(1)
     ).first()
 
 
-def get_next_waiting_entry(session: Session, service_day: date, after_index: int = 0) -> Optional[QueueEntry]:
-    entry = session.exec(
-        select(QueueEntry)
+def next_waiting_id(service_day: date, after_index: Union[int, ColumnElement[int]] = 0) -> Select:
+    # Prefer the first waiting ticket after after_index, wrapping around otherwise,
+    # in one ordered scan instead of a second fallback query
+    return (
+        select(QueueEntry.id)
         .where(
             QueueEntry.service_date == service_day,
             QueueEntry.status == "waiting",
-            QueueEntry.ticket_index > after_index,
         )
-        .order_by(QueueEntry.ticket_index.asc())
-    ).first()
-    if entry is not None:
-        return entry
+        .order_by(
+            case((QueueEntry.ticket_index > after_index, 0), else_=1),
+            QueueEntry.ticket_index.asc(),
+        )
+        .limit(1)
+    )
+
+
+def get_last_served_entry(session: Session, service_day: date) -> Optional[QueueEntry]:
     return session.exec(
         select(QueueEntry)
         .where(
             QueueEntry.service_date == service_day,
-            QueueEntry.status == "waiting",
+            QueueEntry.status == "served",
         )
-        .order_by(QueueEntry.ticket_index.asc())
+        .order_by(QueueEntry.ticket_index.desc())
+        .limit(1)
     ).first()
 
 
-def get_last_served_entry(session: Session, service_day: date) -> Optional[QueueEntry]:
+_DISPLAY_COLUMNS = (
+    QueueEntry.ticket_number,
+    QueueEntry.name,
+    QueueEntry.phone,
+    QueueEntry.birthday,
+)
+
+
+def get_first_display_row(session: Session, service_day: date, entry_status: str) -> Optional[Row]:
     return session.exec(
-        select(QueueEntry)
+        select(*_DISPLAY_COLUMNS)
         .where(
             QueueEntry.service_date == service_day,
-            QueueEntry.status == "served",
+            QueueEntry.status == entry_status,
         )
-        .order_by(QueueEntry.ticket_index.desc())
+        .order_by(QueueEntry.ticket_index.asc())
+        .limit(1)
     ).first()
 
 
+def get_display_minimal(session: Session, service_day: date) -> dict[str, object]:
+    # Same shape as summarize_queue, but only the two rows signage shows are read,
+    # column-only, with the counters grouped in SQL
+    return {
+        "active": get_first_display_row(session, service_day, "active"),
+        "next": get_first_display_row(session, service_day, "waiting"),
+        **count_queue_entries(session, service_day),
+    }
+
+
+def serialize_entry(entry: QueueEntry) -> dict[str, object]:
+    # Same fields as QueueEntryRead, without a pydantic round-trip
+    return {
+        "id": entry.id,
+        "service_date": entry.service_date,
+        "ticket_index": entry.ticket_index,
+        "ticket_number": entry.ticket_number,
+        "name": entry.name,
+        "phone": entry.phone,
+        "created_at": entry.created_at,
+        "status": entry.status,
+        "birthday": entry.birthday,
+    }
+
+
 @app.post("/queue/start-day", response_model=QueueDayRead, status_code=status.HTTP_201_CREATED)
+@serialize_writes
 def start_day(
     payload: StartDayRequest, session: Session = Depends(get_db_session)
 ) -> QueueDayRead:
     service_date = payload.service_date or date.today()
-    existing = session.get(QueueDay, service_date)
-    entries_exist = session.exec(
-        select(QueueEntry.id).where(QueueEntry.service_date == service_date)
-    ).first() is not None
+    entries_exist = (
+        select(QueueEntry.id).where(QueueEntry.service_date == service_date).exists()
+    )
+    existing, has_entries = session.exec(
+        select(QueueDay, entries_exist).where(QueueDay.service_date == service_date)
+    ).first() or (None, False)
     if existing and not payload.overwrite:
         raise HTTPException(status_code=400, detail="صف برای این تاریخ قبلاً آغاز شده است")
-    if existing and entries_exist:
+    if existing and has_entries:
         raise HTTPException(
             status_code=400,
             detail="صف برای این تاریخ فعال است و امکان بازنشانی وجود ندارد",
         )
-    if existing and payload.overwrite:
-        session.delete(existing)
-        session.exec(delete(QueueEntry).where(QueueEntry.service_date == service_date))
-        session.commit()
-
-    queue_day = QueueDay(service_date=service_date)
-    session.add(queue_day)
+    if existing:
+        # Overwrite is only allowed on an empty day, so restart the existing row in place
+        existing.started_at = datetime.utcnow()
+        queue_day = existing
+    else:
+        queue_day = QueueDay(service_date=service_date)
+        session.add(queue_day)
+    # started_at is set in Python, so the response needs no refresh after commit
+    response = QueueDayRead.model_validate(queue_day)
     session.commit()
-    session.refresh(queue_day)
+    _known_days.add(service_date)
     record_queue_snapshot(session, service_date)
-    return QueueDayRead.model_validate(queue_day)
+    bump_display_version(service_date)
+    return response
 
 
-@app.post("/queue/entries", response_model=QueueEntryRead, status_code=status.HTTP_201_CREATED)
-def create_entry(
-    payload: QueueEntryCreate, session: Session = Depends(get_db_session)
+def add_queue_entry(
+    session: Session,
+    service_date: Optional[date],
+    name: str,
+    phone: str,
+    birthday: Optional[date] = None,
 ) -> QueueEntryRead:
-    service_date = payload.service_date or date.today()
-    queue_day = session.get(QueueDay, service_date)
-    if queue_day is None:
-        queue_day = QueueDay(service_date=service_date)
-        session.add(queue_day)
-        session.commit()
-
-    name = payload.name.strip()
-    phone = (payload.phone or "").strip()
+    service_date = service_date or date.today()
+    name = name.strip()
+    phone = (phone or "").strip()
     if not name or not phone:
         raise HTTPException(status_code=400, detail="Name and phone are required")
     normalized_phone = normalize_phone(phone)
 
-    max_index = session.exec(
-        select(func.max(QueueEntry.ticket_index)).where(QueueEntry.service_date == service_date)
-    ).one()
-    current_index = max_index or 0
-    next_index = current_index + 1
-    if next_index > 999:
+    # Register the day and allocate the next ticket index inside the INSERT itself,
+    # so both writes share a single transaction and commit
+    if service_date not in _known_days:
+        session.exec(
+            sqlite_insert(QueueDay).values(service_date=service_date).on_conflict_do_nothing()
+        )
+    # A FROM-less SELECT with the cap in WHERE; HAVING without GROUP BY would need SQLite 3.39
+    next_index = (
+        select(func.coalesce(func.max(QueueEntry.ticket_index), 0) + 1)
+        .where(QueueEntry.service_date == service_date)
+        .scalar_subquery()
+    )
+    entry = session.scalars(
+        insert(QueueEntry)
+        .from_select(
+            [
+                "service_date",
+                "ticket_index",
+                "ticket_number",
+                "name",
+                "phone",
+                "birthday",
+                "status",
+                "created_at",
+            ],
+            select(
+                literal(service_date),
+                next_index,
+                func.printf("%03d", next_index),
+                literal(name),
+                literal(normalized_phone),
+                literal(birthday),
+                literal("waiting"),
+                literal(datetime.utcnow()),
+            ).where(next_index <= 999),
+        )
+        .returning(QueueEntry)
+    ).one_or_none()
+    if entry is None:
+        session.rollback()
         raise HTTPException(status_code=400, detail="Queue number limit reached for the day")
 
-    entry = QueueEntry(
-        service_date=service_date,
-        ticket_index=next_index,
-        ticket_number=f"{next_index:03d}",
-        name=name,
-        phone=normalized_phone,
-        birthday=payload.birthday,
-    )
-    session.add(entry)
+    response = build_entry_read(entry)
     session.commit()
-    session.refresh(entry)
+    _known_days.add(service_date)
     record_queue_snapshot(session, service_date)
-    return QueueEntryRead.model_validate(entry)
+    bump_display_version(service_date)
+    return response
+
+
+@app.post("/queue/entries", response_model=QueueEntryRead, status_code=status.HTTP_201_CREATED)
+@serialize_writes
+def create_entry(
+    payload: QueueEntryCreate, session: Session = Depends(get_db_session)
+) -> QueueEntryRead:
+    return add_queue_entry(
+        session, payload.service_date, payload.name, payload.phone, payload.birthday
+    )
 
 
 @app.patch("/queue/entries/{entry_id}", response_model=QueueEntryRead)
+@serialize_writes
 def update_entry(
     entry_id: int, payload: QueueEntryUpdate, session: Session = Depends(get_db_session)
 ) -> QueueEntryRead:
@@ -408,7 +584,7 @@ def update_entry(
         entry.name = name
 
     if "phone" in updates:
-        phone_value = normalize_digits((updates["phone"] or "").strip())
+        phone_value = (updates["phone"] or "").strip()
         if not phone_value:
             raise HTTPException(status_code=400, detail="شماره تماس نمی‌تواند خالی باشد")
         entry.phone = normalize_phone(phone_value)
@@ -416,132 +592,198 @@ def update_entry(
     if "birthday" in updates:
         entry.birthday = updates["birthday"]
 
+    # Every field is already loaded or was just set, so build the response before
+    # the commit expires the instance instead of refreshing it afterwards
+    service_day = entry.service_date
+    response = build_entry_read(entry)
     session.add(entry)
     session.commit()
-    session.refresh(entry)
-    record_queue_snapshot(session, entry.service_date)
-    return QueueEntryRead.model_validate(entry)
+    record_queue_snapshot(session, service_day)
+    bump_display_version(service_day)
+    return response
+
 
+LIST_ENTRIES_BATCH_SIZE = 64
 
-@app.get("/queue/entries", response_model=list[QueueEntryRead])
+
+def stream_queue_entries(service_day: date) -> Iterator[bytes]:
+    # Runs while the response is being sent, after request dependencies have been
+    # closed, so it opens its own read session
+    with get_read_session() as session:
+        entries = session.exec(
+            select(QueueEntry)
+            .where(QueueEntry.service_date == service_day)
+            .order_by(QueueEntry.ticket_index.asc())
+            .execution_options(yield_per=LIST_ENTRIES_BATCH_SIZE)
+        )
+        yield b"["
+        separator = b""
+        for batch in entries.partitions():
+            yield separator + b",".join(orjson.dumps(serialize_entry(entry)) for entry in batch)
+            separator = b","
+        yield b"]"
+
+
+@app.get(
+    "/queue/entries",
+    response_model=None,
+    responses={200: {"model": list[QueueEntryRead]}},
+)
 def list_entries(
     service_date: Optional[str] = Query(default=None),
-    session: Session = Depends(get_db_session),
-) -> list[QueueEntryRead]:
+) -> StreamingResponse:
     service_day = resolve_service_day(service_date)
-    entries = fetch_queue_entries(session, service_day)
-    return [QueueEntryRead.model_validate(entry) for entry in entries]
+    return StreamingResponse(stream_queue_entries(service_day), media_type="application/json")
 
 
-@app.get("/queue/display")
-def display_payload(
-    service_date: Optional[str] = Query(default=None),
-    session: Session = Depends(get_db_session),
-) -> dict[str, object]:
-    service_day = resolve_service_day(service_date)
-    entries = fetch_queue_entries(session, service_day)
-    summary = summarize_queue(entries)
+_DISPLAY_ENTRY_KEYS = ("ticket", "name", "phone", "birthday")
+_display_entry_values = operator.attrgetter("ticket_number", "name", "phone", "birthday")
+
+
+def display_entry(row: Optional[Row]) -> Optional[dict[str, object]]:
+    if row is None:
+        return None
+    return dict(zip(_DISPLAY_ENTRY_KEYS, _display_entry_values(row)))
+
+
+def build_display_payload(session: Session, service_day: date, full: bool) -> dict[str, object]:
+    if full:
+        rows = fetch_queue_rows(session, service_day)
+        summary = summarize_queue(rows)
+    else:
+        # Signage polls only need the counters and the active/next tickets, so
+        # avoid loading every entry of the day
+        summary = get_display_minimal(session, service_day)
+
+    payload: dict[str, object] = {
+        "service_date": service_day,
+        "count": summary["count"],
+        "pending_count": summary["pending_count"],
+        "waiting_count": summary["waiting_count"],
+        "served_count": summary["served_count"],
+        "active": display_entry(summary["active"]),
+        "next": display_entry(summary["next"]),
+    }
+    if not full:
+        return payload
+
     snapshots = session.exec(
         select(QueueLoadSnapshot)
         .where(QueueLoadSnapshot.service_date == service_day)
         .order_by(QueueLoadSnapshot.window_start.asc())
     ).all()
-    return {
-        "service_date": service_day.isoformat(),
-        "count": len(entries),
-        "pending_count": summary["pending_count"],
-        "waiting_count": summary["waiting_count"],
-        "served_count": summary["served_count"],
-        "active": (
-            {
-                "ticket": summary["active"].ticket_number,
-                "name": summary["active"].name,
-                "phone": summary["active"].phone,
-                "birthday": summary["active"].birthday.isoformat()
-                if summary["active"].birthday
-                else None,
-            }
-            if summary["active"]
-            else None
-        ),
-        "next": (
-            {
-                "ticket": summary["next"].ticket_number,
-                "name": summary["next"].name,
-                "phone": summary["next"].phone,
-                "birthday": summary["next"].birthday.isoformat()
-                if summary["next"].birthday
-                else None,
-            }
-            if summary["next"]
-            else None
-        ),
-        "queue": [
-            {
-                "ticket": entry.ticket_number,
-                "name": entry.name,
-                "phone": entry.phone,
-                "status": entry.status,
-                "birthday": entry.birthday.isoformat() if entry.birthday else None,
-            }
-            for entry in entries
-        ],
-        "history": [
-            {
-                "window_start": snapshot.window_start.isoformat(),
-                "pending_count": snapshot.pending_count,
-                "waiting_count": snapshot.waiting_count,
-                "served_count": snapshot.served_count,
-                "captured_at": snapshot.captured_at.isoformat(),
-            }
-            for snapshot in snapshots
-        ],
-    }
+    payload["queue"] = [dict(zip(_QUEUE_ROW_KEYS, row)) for row in rows]
+    payload["history"] = [
+        {
+            "window_start": snapshot.window_start,
+            "pending_count": snapshot.pending_count,
+            "waiting_count": snapshot.waiting_count,
+            "served_count": snapshot.served_count,
+            "captured_at": snapshot.captured_at,
+        }
+        for snapshot in snapshots
+    ]
+    return payload
+
 
+def render_display_body(service_day: date, full: bool) -> bytes:
+    with get_read_session() as session:
+        return orjson.dumps(build_display_payload(session, service_day, full))
 
-@app.post("/queue/next", response_model=QueueFlowResponse)
+
+# Async so cache hits and 304s are answered on the event loop; only a miss
+# borrows a worker thread for the blocking SQLite read
+@app.get("/queue/display")
+async def display_payload(
+    request: Request,
+    service_date: Optional[str] = Query(default=None),
+    full: bool = Query(default=False),
+) -> Response:
+    service_day = resolve_service_day(service_date)
+    version = _display_version.get(service_day, 0)
+    now = time.monotonic()
+    cache_key = (service_day, full)
+    cached = _display_cache.get(cache_key)
+    if cached is not None and cached[0] == version and cached[1] > now:
+        body, etag = cached[2], cached[3]
+    else:
+        body = await run_in_threadpool(render_display_body, service_day, full)
+        # Hash the body so the same state gets the same ETag from every worker
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        # Skip caching if a mutation landed while the payload was being built
+        if _display_version.get(service_day, 0) == version:
+            prune_expired(_display_cache, now)
+            _display_cache[cache_key] = (version, now + DISPLAY_CACHE_TTL_SECONDS, body, etag)
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@app.post("/queue/next", response_model=None, responses={200: {"model": QueueFlowResponse}})
+@serialize_writes
 def call_next_number(
     service_date: Optional[str] = Body(default=None, embed=True),
     session: Session = Depends(get_db_session),
-) -> QueueFlowResponse:
+) -> dict[str, object]:
     service_day = resolve_service_day(service_date)
-    active_entry = get_active_entry(session, service_day)
-    served_entry: Optional[QueueEntry] = None
-    last_index = 0
-    if active_entry:
-        active_entry.status = "served"
-        served_entry = active_entry
-        last_index = active_entry.ticket_index
+    active_id = (
+        select(QueueEntry.id)
+        .where(
+            QueueEntry.service_date == service_day,
+            QueueEntry.status == "active",
+        )
+        .order_by(QueueEntry.ticket_index.asc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    served_entry = session.scalars(
+        update(QueueEntry)
+        .where(QueueEntry.id == active_id)
+        .values(status="served")
+        .returning(QueueEntry)
+    ).first()
+    if served_entry:
+        last_index = served_entry.ticket_index
     else:
-        last_served = get_last_served_entry(session, service_day)
-        if last_served is not None:
-            last_index = last_served.ticket_index
-
-    next_entry = get_next_waiting_entry(session, service_day, after_index=last_index)
-    if next_entry:
-        next_entry.status = "active"
+        # Evaluated inside the next UPDATE, so calling the first ticket stays at two statements
+        last_index = func.coalesce(
+            select(func.max(QueueEntry.ticket_index))
+            .where(
+                QueueEntry.service_date == service_day,
+                QueueEntry.status == "served",
+            )
+            .scalar_subquery(),
+            0,
+        )
 
+    next_id = next_waiting_id(service_day, last_index).scalar_subquery()
+    next_entry = session.scalars(
+        update(QueueEntry)
+        .where(QueueEntry.id == next_id)
+        .values(status="active")
+        .returning(QueueEntry)
+    ).first()
+    # RETURNING already carries the updated rows; build the response before the
+    # commit expires them so no refresh round-trips are needed
+    response = {
+        "active": serialize_entry(next_entry) if next_entry else None,
+        "served": serialize_entry(served_entry) if served_entry else None,
+        "detail": "نفر بعدی فراخوانی شد" if next_entry else "فردی در صف باقی نمانده است",
+    }
     session.commit()
 
-    if next_entry:
-        session.refresh(next_entry)
-    if served_entry:
-        session.refresh(served_entry)
-
     record_queue_snapshot(session, service_day)
-
-    return QueueFlowResponse(
-        active=QueueEntryRead.model_validate(next_entry) if next_entry else None,
-        served=QueueEntryRead.model_validate(served_entry) if served_entry else None,
-        detail="نفر بعدی فراخوانی شد" if next_entry else "فردی در صف باقی نمانده است",
-    )
+    bump_display_version(service_day)
+    return response
 
 
-@app.post("/queue/previous", response_model=QueueFlowResponse)
+@app.post("/queue/previous", response_model=None, responses={200: {"model": QueueFlowResponse}})
+@serialize_writes
 def call_previous_number(
     service_date: Optional[str] = Body(default=None, embed=True),
     session: Session = Depends(get_db_session),
-) -> QueueFlowResponse:
+) -> dict[str, object]:
     service_day = resolve_service_day(service_date)
     previous_entry = get_last_served_entry(session, service_day)
     if previous_entry is None:
@@ -551,37 +793,35 @@ def call_previous_number(
     if active_entry:
         active_entry.status = "waiting"
     previous_entry.status = "active"
+    response = {
+        "active": serialize_entry(previous_entry),
+        "served": None,
+        "detail": "نفر قبلی دوباره فراخوانی شد",
+    }
     session.commit()
 
-    session.refresh(previous_entry)
-    if active_entry:
-        session.refresh(active_entry)
-
     record_queue_snapshot(session, service_day)
-
-    return QueueFlowResponse(
-        active=QueueEntryRead.model_validate(previous_entry),
-        served=None,
-        detail="نفر قبلی دوباره فراخوانی شد",
-    )
+    bump_display_version(service_day)
+    return response
 
 
 @app.post("/queue/xibo", response_model=QueueEntryRead)
+@serialize_writes
 def create_entry_from_form(
     name: str = Form(...),
     phone: str = Form(...),
     service_date: Optional[date] = Form(default=None),
     session: Session = Depends(get_db_session),
 ) -> QueueEntryRead:
-    payload = QueueEntryCreate(name=name, phone=phone, service_date=service_date)
-    return create_entry(payload, session)
+    # Form fields arrive already coerced, so skip building a QueueEntryCreate
+    return add_queue_entry(session, service_date, name, phone)
 
 
 @app.get("/queue/xibo-dataset")
 def xibo_dataset(
     service_date: Optional[str] = Query(default=None),
-    session: Session = Depends(get_db_session),
-) -> dict[str, object]:
+    session: Session = Depends(get_read_db_session),
+) -> ORJSONResponse:
     """
     XIBO DataSet endpoint for displaying queue information on digital signage.
     Returns current serving and next serving information as a list suitable for XIBO DataSets.
@@ -593,8 +833,7 @@ def xibo_dataset(
     - status_label: Display label in Persian
     """
     service_day = resolve_service_day(service_date)
-    entries = fetch_queue_entries(session, service_day)
-    summary = summarize_queue(entries)
+    summary = get_display_minimal(session, service_day)
 
     result = []
 
@@ -644,14 +883,14 @@ def xibo_dataset(
             "served_count": summary["served_count"],
         })
 
-    return {"data": result}
+    return ORJSONResponse(content={"data": result})
 
 
 @app.get("/queue/xibo-simple")
 def xibo_simple(
     service_date: Optional[str] = Query(default=None),
-    session: Session = Depends(get_db_session),
-) -> dict[str, object]:
+    session: Session = Depends(get_read_db_session),
+) -> ORJSONResponse:
     """
     Simplified XIBO endpoint returning current and next serving as single object.
     Perfect for simple XIBO ticker displays.
@@ -665,10 +904,9 @@ def xibo_simple(
     - served_count: Number of people served
     """
     service_day = resolve_service_day(service_date)
-    entries = fetch_queue_entries(session, service_day)
-    summary = summarize_queue(entries)
+    summary = get_display_minimal(session, service_day)
 
-    return {
+    return ORJSONResponse(content={
         "data": {
             "current_number": summary["active"].ticket_number if summary["active"] else "—",
             "current_name": summary["active"].name if summary["active"] else "در انتظار فراخوانی",
@@ -677,93 +915,131 @@ def xibo_simple(
             "waiting_count": summary["waiting_count"],
             "served_count": summary["served_count"],
             "pending_count": summary["pending_count"],
-            "total_count": len(entries),
+            "total_count": summary["count"],
         }
-    }
-
-
-@app.get("/queue/rss")
-def queue_rss_feed(
-    service_date: Optional[str] = Query(default=None),
-    session: Session = Depends(get_db_session),
-) -> Response:
-    """
-    RSS feed endpoint for Xibo RSS Ticker widget.
-
-    Returns real-time queue information in RSS 2.0 format.
-    Configure your Xibo RSS Ticker widget to poll this endpoint
-    at regular intervals (e.g., every 10-30 seconds) for automatic updates.
-
-    RSS items include:
-    - Current serving ticket and name
-    - Next serving ticket and name
-    - Queue statistics (waiting count, served count)
-    """
-    service_day = resolve_service_day(service_date)
-    entries = fetch_queue_entries(session, service_day)
-    summary = summarize_queue(entries)
+    })
 
-    # Build current serving info
-    current_ticket = summary["active"].ticket_number if summary["active"] else "—"
-    current_name = summary["active"].name if summary["active"] else "در انتظار فراخوانی"
 
-    # Build next serving info
-    next_ticket = summary["next"].ticket_number if summary["next"] else "—"
-    next_name = summary["next"].name if summary["next"] else "صف خالی است"
+RSS_CACHE_TTL_SECONDS = 5.0
 
-    # Build RSS XML with proper escaping
-    rss_content = f"""<?xml version="1.0" encoding="UTF-8"?>
+_RSS_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
 <rss version="2.0">
   <channel>
     <title>وضعیت صف</title>
     <description>اطلاعات لحظه‌ای صف</description>
     <link>http://localhost/queue</link>
-    <lastBuildDate>{datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')}</lastBuildDate>
+    <lastBuildDate>{build_date}</lastBuildDate>
     <item>
       <title>در حال خدمت: {current_ticket}</title>
       <description>{current_name}</description>
-      <guid isPermaLink="false">current-{service_day.isoformat()}-{current_ticket}</guid>
+      <guid isPermaLink="false">current-{day}-{current_ticket}</guid>
     </item>
     <item>
       <title>نفر بعدی: {next_ticket}</title>
       <description>{next_name}</description>
-      <guid isPermaLink="false">next-{service_day.isoformat()}-{next_ticket}</guid>
+      <guid isPermaLink="false">next-{day}-{next_ticket}</guid>
     </item>
     <item>
       <title>آمار صف</title>
-      <description>در انتظار: {summary["waiting_count"]} | خدمت شده: {summary["served_count"]} | کل: {summary["pending_count"]}</description>
-      <guid isPermaLink="false">stats-{service_day.isoformat()}-{datetime.utcnow().timestamp()}</guid>
+      <description>در انتظار: {waiting_count} | خدمت شده: {served_count} | کل: {pending_count}</description>
+      <guid isPermaLink="false">stats-{day}-{stamp}</guid>
     </item>
   </channel>
 </rss>"""
 
-    return Response(content=rss_content, media_type="application/rss+xml")
+# Xibo polls every few seconds; reuse the rendered feed until the queue changes or the TTL lapses
+_rss_cache: dict[date, tuple[int, float, bytes]] = {}
+
+
+def render_rss_feed(service_day: date) -> bytes:
+    with get_read_session() as session:
+        summary = get_display_minimal(session, service_day)
+    active = summary["active"]
+    upcoming = summary["next"]
+    current_ticket = escape(active.ticket_number) if active else "—"
+    next_ticket = escape(upcoming.ticket_number) if upcoming else "—"
+    utc_now = datetime.utcnow()
+    day = service_day.isoformat()
+
+    return _RSS_TEMPLATE.format_map({
+        "build_date": utc_now.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+        "current_ticket": current_ticket,
+        "current_name": escape(active.name) if active else "در انتظار فراخوانی",
+        "next_ticket": next_ticket,
+        "next_name": escape(upcoming.name) if upcoming else "صف خالی است",
+        "waiting_count": summary["waiting_count"],
+        "served_count": summary["served_count"],
+        "pending_count": summary["pending_count"],
+        "day": day,
+        "stamp": utc_now.timestamp(),
+    }).encode("utf-8")
+
+
+@app.get("/queue/rss")
+async def queue_rss_feed(
+    service_date: Optional[str] = Query(default=None),
+) -> Response:
+    """
+    RSS feed endpoint for Xibo RSS Ticker widget.
+
+    Returns real-time queue information in RSS 2.0 format.
+    Configure your Xibo RSS Ticker widget to poll this endpoint
+    at regular intervals (e.g., every 10-30 seconds) for automatic updates.
+
+    RSS items include:
+    - Current serving ticket and name
+    - Next serving ticket and name
+    - Queue statistics (waiting count, served count)
+    """
+    service_day = resolve_service_day(service_date)
+    version = _display_version.get(service_day, 0)
+    now = time.monotonic()
+    cached = _rss_cache.get(service_day)
+    if cached is not None and cached[0] == version and cached[1] > now:
+        return Response(content=cached[2], media_type="application/rss+xml")
+
+    body = await run_in_threadpool(render_rss_feed, service_day)
+
+    if _display_version.get(service_day, 0) == version:
+        prune_expired(_rss_cache, now)
+        _rss_cache[service_day] = (version, now + RSS_CACHE_TTL_SECONDS, body)
+    return Response(content=body, media_type="application/rss+xml")
+
+
+def render_admin_page() -> bytes:
+    return templates.get_template("admin.html").render().encode("utf-8")
+
+
+# The admin console takes no per-request context, so render it once at import
+ADMIN_PAGE_HTML = render_admin_page()
 
 
 @app.get("/queue/admin", response_class=HTMLResponse)
-def admin_page(request: Request) -> HTMLResponse:
-    return templates.TemplateResponse("admin.html", {"request": request})
+async def admin_page() -> HTMLResponse:
+    if TEMPLATE_AUTO_RELOAD:
+        return HTMLResponse(content=render_admin_page())
+    return HTMLResponse(content=ADMIN_PAGE_HTML)
 
 
 @app.get("/queue/load-history")
 def load_history(
     service_date: Optional[str] = Query(default=None),
-    session: Session = Depends(get_db_session),
-) -> list[dict[str, object]]:
+    session: Session = Depends(get_read_db_session),
+) -> ORJSONResponse:
     service_day = resolve_service_day(service_date)
     snapshots = session.exec(
         select(QueueLoadSnapshot)
         .where(QueueLoadSnapshot.service_date == service_day)
         .order_by(QueueLoadSnapshot.window_start.asc())
     ).all()
-    return [
+    return ORJSONResponse(content=[
         {
-            "service_date": snapshot.service_date.isoformat(),
-            "window_start": snapshot.window_start.isoformat(),
+            "service_date": snapshot.service_date,
+            "window_start": snapshot.window_start,
             "pending_count": snapshot.pending_count,
             "waiting_count": snapshot.waiting_count,
             "served_count": snapshot.served_count,
-            "captured_at": snapshot.captured_at.isoformat(),
+            "captured_at": snapshot.captured_at,
         }
         for snapshot in snapshots
-    ]
+    ])
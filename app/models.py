@@ -1,7 +1,7 @@
 from datetime import date, datetime
 from typing import Optional
 
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import Field, SQLModel
 
 
@@ -23,6 +23,7 @@ class QueueEntry(SQLModel, table=True):
 
     __table_args__ = (
         UniqueConstraint("service_date", "ticket_index", name="uq_queue_entry_per_day"),
+        Index("ix_qe_date_status_idx", "service_date", "status", "ticket_index"),
     )
 
 